@@ -0,0 +1,24 @@
+"""Compile the JWT token module with mypyc, in place next to its source.
+
+    python build_mypyc.py build_ext --inplace
+
+Delete src/llm_router/utils/tokens*.so to go back to pure Python.
+"""
+
+from mypyc.build import mypycify
+from setuptools import setup
+
+setup(
+    name="llm-router-mypyc",
+    # The app imports itself as src.llm_router, so keep the repo root as the
+    # package root instead of letting setuptools treat src/ as a src-layout
+    package_dir={"": "."},
+    packages=[],
+    ext_modules=mypycify(
+        [
+            "--ignore-missing-imports",
+            "--follow-imports=silent",
+            "src/llm_router/utils/tokens.py",
+        ]
+    ),
+)
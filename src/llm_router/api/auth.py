@@ -1,18 +1,35 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.orm import Session
 from typing import List
 
 from ..database import get_db, get_redis
-from ..models.api_key import APIKey
 from ..schemas import APIKeyRequest, APIKeyResponse, APIKeyInfo
-from ..utils.auth import APIKeyManager
+from ..utils.auth import APIKeyManager, CachedAPIKey
 from .dependencies import get_current_api_key
 
 router = APIRouter(prefix="/v1/api-keys", tags=["Authentication"])
 
+# Routes return ORJSONResponse directly, which skips FastAPI's response
+# validation pass; response_model is kept so the schemas stay in the docs.
+
+
+def _key_info(api_key: CachedAPIKey, db: Session) -> dict:
+    """Build the APIKeyInfo body for an API key record."""
+    # The authenticated key is a cached snapshot, so read the live usage count
+    usage_count = APIKeyManager(db, get_redis()).get_usage_count(api_key.id)
+    return {
+        "id": api_key.id,
+        "name": api_key.name,
+        "description": api_key.description,
+        "created_at": api_key.created_at,
+        "rate_limit": api_key.rate_limit,
+        "usage_count": usage_count,
+    }
+
 
 @router.post("/", response_model=APIKeyResponse)
-async def create_api_key(request: APIKeyRequest, db: Session = Depends(get_db)):
+def create_api_key(request: APIKeyRequest, db: Session = Depends(get_db)):
     """Create a new API key."""
     try:
         redis_client = get_redis()
@@ -20,7 +37,7 @@ async def create_api_key(request: APIKeyRequest, db: Session = Depends(get_db)):
 
         api_key = key_manager.create_api_key(request)
 
-        return api_key
+        return ORJSONResponse(content=api_key.model_dump())
 
     except Exception as e:
         raise HTTPException(
@@ -29,22 +46,14 @@ async def create_api_key(request: APIKeyRequest, db: Session = Depends(get_db)):
 
 
 @router.get("/", response_model=List[APIKeyInfo])
-async def list_api_keys(
-    current_key: APIKey = Depends(get_current_api_key), db: Session = Depends(get_db)
+def list_api_keys(
+    current_key: CachedAPIKey = Depends(get_current_api_key),
+    db: Session = Depends(get_db),
 ):
     """List API keys (returns only the current key for security)."""
     try:
         # For security, only return the current API key's info
-        return [
-            APIKeyInfo(
-                id=current_key.id,
-                name=current_key.name,
-                description=current_key.description,
-                created_at=current_key.created_at,
-                rate_limit=current_key.rate_limit,
-                usage_count=current_key.usage_count,
-            )
-        ]
+        return ORJSONResponse(content=[_key_info(current_key, db)])
 
     except Exception as e:
         raise HTTPException(
@@ -53,22 +62,18 @@ async def list_api_keys(
 
 
 @router.get("/current", response_model=APIKeyInfo)
-async def get_current_key_info(current_key: APIKey = Depends(get_current_api_key)):
+def get_current_key_info(
+    current_key: CachedAPIKey = Depends(get_current_api_key),
+    db: Session = Depends(get_db),
+):
     """Get information about the current API key."""
-    return APIKeyInfo(
-        id=current_key.id,
-        name=current_key.name,
-        description=current_key.description,
-        created_at=current_key.created_at,
-        rate_limit=current_key.rate_limit,
-        usage_count=current_key.usage_count,
-    )
+    return ORJSONResponse(content=_key_info(current_key, db))
 
 
 @router.delete("/{key_id}")
-async def delete_api_key(
+def delete_api_key(
     key_id: str,
-    current_key: APIKey = Depends(get_current_api_key),
+    current_key: CachedAPIKey = Depends(get_current_api_key),
     db: Session = Depends(get_db),
 ):
     """Delete an API key (can only delete your own key)."""
@@ -79,8 +84,8 @@ async def delete_api_key(
             )
 
         # Soft delete - just mark as inactive
-        current_key.is_active = False
-        db.commit()
+        key_manager = APIKeyManager(db, get_redis())
+        key_manager.deactivate_api_key(current_key)
 
         return {"message": "API key deactivated successfully"}
 
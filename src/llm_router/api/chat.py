@@ -1,48 +1,82 @@
+import os
 import time
-import uuid
-import json
 import logging
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import StreamingResponse
-from sqlalchemy.orm import Session
-
-from ..database import get_db
-from ..models.api_key import APIKey
-from ..models.usage_log import UsageLog
-from ..schemas import (
-    ChatCompletionRequest,
-    ChatCompletionResponse,
-    ChatCompletionChoice,
-    ChatCompletionUsage,
-    ChatMessage,
-)
-from ..providers.clients import client_manager
-from .dependencies import get_current_api_key
+
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import ValidationError
+
+from ..utils.auth import CachedAPIKey
+from ..schemas import ChatCompletionRequest, ChatCompletionResponse
+from ..providers.clients import ClientManager
+from ..utils.usage_logs import enqueue_usage_log
+from .dependencies import get_client_manager, get_current_api_key
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/v1/chat", tags=["Chat Completion"])
 
+# Headers for server-sent events; stop proxies from buffering the stream
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+# Basic pricing per 1K tokens (these are approximate)
+PRICING_PER_1K = {
+    ("openai", "gpt-4"): 0.03,
+    ("openai", "gpt-4-turbo"): 0.01,
+    ("openai", "gpt-4o"): 0.005,
+    ("openai", "gpt-4o-mini"): 0.0015,
+    ("openai", "gpt-3.5-turbo"): 0.0015,
+}
+
+# Fallback pricing for models not listed above
+DEFAULT_PRICING_PER_1K = {"groq": 0.0001, "gemini": 0.001}
+
+# The request body is validated straight from the raw bytes by pydantic-core,
+# so the schema is documented by hand (ChatMessage comes in via the response)
+CHAT_REQUEST_SCHEMA = ChatCompletionRequest.model_json_schema(
+    ref_template="#/components/schemas/{model}"
+)
+CHAT_REQUEST_SCHEMA.pop("$defs", None)
+
 
-@router.post("/completions")
+@router.post(
+    "/completions",
+    response_model=ChatCompletionResponse,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": CHAT_REQUEST_SCHEMA}},
+        }
+    },
+)
 async def create_chat_completion(
-    request: ChatCompletionRequest,
-    current_key: APIKey = Depends(get_current_api_key),
-    db: Session = Depends(get_db),
+    http_request: Request,
+    current_key: CachedAPIKey = Depends(get_current_api_key),
+    client_manager: ClientManager = Depends(get_client_manager),
 ):
     """Create a chat completion using the specified model."""
 
+    try:
+        request = ChatCompletionRequest.model_validate_json(await http_request.body())
+    except ValidationError as e:
+        raise RequestValidationError(
+            [
+                {**error, "loc": ("body", *error["loc"])}
+                for error in e.errors(include_url=False)
+            ]
+        )
+
     try:
         # Get the appropriate client
         client, provider = client_manager.get_client_for_model(
             request.model, request.provider
         )
 
-        # Prepare the OpenAI API request
+        # Prepare the OpenAI API request (messages dumped in one pydantic-core call)
         openai_request = {
             "model": request.model,
-            "messages": [
-                {"role": msg.role, "content": msg.content} for msg in request.messages
-            ],
+            "messages": request.model_dump(include={"messages"})["messages"],
             "max_tokens": request.max_tokens,
             "temperature": request.temperature,
             "stream": request.stream,
@@ -58,44 +92,53 @@ async def create_chat_completion(
             # Handle streaming response
             return StreamingResponse(
                 stream_chat_completion(
-                    client, openai_request, provider, current_key.id, db
+                    client,
+                    openai_request,
+                    provider,
+                    current_key.id,
+                    client_manager.semaphores[provider],
                 ),
-                media_type="text/plain",
+                media_type="text/event-stream",
+                headers=SSE_HEADERS,
             )
         else:
             # Handle regular response
-            response = await client.chat.completions.create(**openai_request)
+            async with client_manager.semaphores[provider]:
+                response = await client.chat.completions.create(**openai_request)
 
             # Log usage
-            await log_usage(
+            log_usage(
                 api_key_id=current_key.id,
                 provider=provider,
                 model=request.model,
                 usage=response.usage,
-                db=db,
             )
 
-            # Convert to our response format
-            return ChatCompletionResponse(
-                id=response.id,
-                created=response.created,
-                model=response.model,
-                provider=provider,
-                choices=[
-                    ChatCompletionChoice(
-                        index=choice.index,
-                        message=ChatMessage(
-                            role=choice.message.role, content=choice.message.content
-                        ),
-                        finish_reason=choice.finish_reason,
-                    )
-                    for choice in response.choices
-                ],
-                usage=ChatCompletionUsage(
-                    prompt_tokens=response.usage.prompt_tokens,
-                    completion_tokens=response.usage.completion_tokens,
-                    total_tokens=response.usage.total_tokens,
-                ),
+            # Convert to our response format (ChatCompletionResponse shape)
+            return ORJSONResponse(
+                content={
+                    "id": response.id,
+                    "object": "chat.completion",
+                    "created": response.created,
+                    "model": response.model,
+                    "provider": provider,
+                    "choices": [
+                        {
+                            "index": choice.index,
+                            "message": {
+                                "role": choice.message.role,
+                                "content": choice.message.content,
+                            },
+                            "finish_reason": choice.finish_reason,
+                        }
+                        for choice in response.choices
+                    ],
+                    "usage": {
+                        "prompt_tokens": response.usage.prompt_tokens,
+                        "completion_tokens": response.usage.completion_tokens,
+                        "total_tokens": response.usage.total_tokens,
+                    },
+                }
             )
 
     except HTTPException:
@@ -105,47 +148,49 @@ async def create_chat_completion(
         raise HTTPException(status_code=500, detail=f"Chat completion failed: {str(e)}")
 
 
-async def stream_chat_completion(client, request_data, provider, api_key_id, db):
+async def stream_chat_completion(client, request_data, provider, api_key_id, semaphore):
     """Stream chat completion responses."""
     try:
-        stream = await client.chat.completions.create(**request_data)
-
         total_tokens = 0
 
-        async for chunk in stream:
-            if chunk.choices:
-                # Send the chunk to client
-                chunk_data = {
-                    "id": chunk.id,
-                    "object": "chat.completion.chunk",
-                    "created": chunk.created,
-                    "model": chunk.model,
-                    "provider": provider,
-                    "choices": [
-                        {
-                            "index": choice.index,
-                            "delta": {
-                                "role": getattr(choice.delta, "role", None),
-                                "content": getattr(choice.delta, "content", None),
-                            },
-                            "finish_reason": choice.finish_reason,
-                        }
-                        for choice in chunk.choices
-                    ],
-                }
-
-                yield f"data: {json.dumps(chunk_data)}\n\n"
-
-                # Track token usage (approximate for streaming)
-                if hasattr(chunk, "usage") and chunk.usage:
-                    total_tokens = chunk.usage.total_tokens
+        # Hold the provider slot until the upstream stream is finished
+        async with semaphore:
+            stream = await client.chat.completions.create(**request_data)
+
+            async for chunk in stream:
+                if chunk.choices:
+                    # Send the chunk to client
+                    chunk_data = {
+                        "id": chunk.id,
+                        "object": "chat.completion.chunk",
+                        "created": chunk.created,
+                        "model": chunk.model,
+                        "provider": provider,
+                        "choices": [
+                            {
+                                "index": choice.index,
+                                "delta": {
+                                    "role": getattr(choice.delta, "role", None),
+                                    "content": getattr(choice.delta, "content", None),
+                                },
+                                "finish_reason": choice.finish_reason,
+                            }
+                            for choice in chunk.choices
+                        ],
+                    }
+
+                    yield b"data: " + orjson.dumps(chunk_data) + b"\n\n"
+
+                    # Track token usage (approximate for streaming)
+                    if hasattr(chunk, "usage") and chunk.usage:
+                        total_tokens = chunk.usage.total_tokens
 
         # Send final message
-        yield "data: [DONE]\n\n"
+        yield b"data: [DONE]\n\n"
 
         # Log usage for streaming
         if total_tokens > 0:
-            await log_usage(
+            log_usage(
                 api_key_id=api_key_id,
                 provider=provider,
                 model=request_data["model"],
@@ -154,44 +199,42 @@ async def stream_chat_completion(client, request_data, provider, api_key_id, db)
                     "prompt_tokens": 0,
                     "completion_tokens": total_tokens,
                 },
-                db=db,
             )
 
     except Exception as e:
         logger.error(f"Streaming failed: {e}")
-        yield f"data: {json.dumps({'error': str(e)})}\n\n"
+        yield b"data: " + orjson.dumps({"error": str(e)}) + b"\n\n"
 
 
-async def log_usage(api_key_id: str, provider: str, model: str, usage, db: Session):
-    """Log API usage to database."""
+def log_usage(api_key_id: str, provider: str, model: str, usage):
+    """Log API usage (written to the database in batches by the usage log writer)."""
     try:
-        usage_log = UsageLog(
-            id=f"log_{uuid.uuid4().hex[:16]}",
-            api_key_id=api_key_id,
-            provider=provider,
-            model=model,
-            endpoint="/v1/chat/completions",
-            tokens_used=(
-                usage.total_tokens
-                if hasattr(usage, "total_tokens")
-                else usage.get("total_tokens", 0)
-            ),
-            prompt_tokens=(
-                usage.prompt_tokens
-                if hasattr(usage, "prompt_tokens")
-                else usage.get("prompt_tokens", 0)
-            ),
-            completion_tokens=(
-                usage.completion_tokens
-                if hasattr(usage, "completion_tokens")
-                else usage.get("completion_tokens", 0)
-            ),
-            cost=calculate_cost(provider, model, usage),
+        enqueue_usage_log(
+            {
+                "id": f"log_{os.urandom(8).hex()}",
+                "api_key_id": api_key_id,
+                "provider": provider,
+                "model": model,
+                "endpoint": "/v1/chat/completions",
+                "tokens_used": (
+                    usage.total_tokens
+                    if hasattr(usage, "total_tokens")
+                    else usage.get("total_tokens", 0)
+                ),
+                "prompt_tokens": (
+                    usage.prompt_tokens
+                    if hasattr(usage, "prompt_tokens")
+                    else usage.get("prompt_tokens", 0)
+                ),
+                "completion_tokens": (
+                    usage.completion_tokens
+                    if hasattr(usage, "completion_tokens")
+                    else usage.get("completion_tokens", 0)
+                ),
+                "cost": calculate_cost(provider, model, usage),
+            }
         )
 
-        db.add(usage_log)
-        db.commit()
-
     except Exception as e:
         logger.error(f"Failed to log usage: {e}")
 
@@ -205,20 +248,8 @@ def calculate_cost(provider: str, model: str, usage) -> float:
         else usage.get("total_tokens", 0)
     )
 
-    # Basic pricing per 1K tokens (these are approximate)
-    pricing = {
-        "openai": {
-            "gpt-4": 0.03,
-            "gpt-4-turbo": 0.01,
-            "gpt-4o": 0.005,
-            "gpt-4o-mini": 0.0015,
-            "gpt-3.5-turbo": 0.0015,
-        },
-        "groq": {"default": 0.0001},
-        "gemini": {"default": 0.001},
-    }
-
-    provider_pricing = pricing.get(provider, {})
-    cost_per_1k = provider_pricing.get(model, provider_pricing.get("default", 0.001))
+    cost_per_1k = PRICING_PER_1K.get((provider, model))
+    if cost_per_1k is None:
+        cost_per_1k = DEFAULT_PRICING_PER_1K.get(provider, 0.001)
 
     return (total_tokens / 1000) * cost_per_1k
@@ -1,58 +1,33 @@
-from fastapi import Depends, HTTPException, Header, Request
-from sqlalchemy.orm import Session
+import logging
 from typing import Optional
 
-from ..database import get_db, get_redis
-from ..models.api_key import APIKey
-from ..utils.auth import APIKeyManager
-
-
 from fastapi import Depends, HTTPException, Header, Request
 from sqlalchemy.orm import Session
-from typing import Optional
 
 from ..database import get_db, get_redis
-from ..models.api_key import APIKey
-from ..utils.auth import APIKeyManager
+from ..providers.clients import ClientManager
+from ..utils.auth import APIKeyManager, CachedAPIKey
+
+logger = logging.getLogger(__name__)
 
 
-async def verify_api_key(
+def verify_api_key(
     request: Request,
     authorization: Optional[str] = Header(None),
     api_key: Optional[str] = Header(None, alias="x-api-key"),
     db: Session = Depends(get_db),
-) -> APIKey:
-    """Verify API key from Authorization header with multiple fallback methods."""
+) -> CachedAPIKey:
+    """Verify API key from the Authorization or x-api-key header."""
 
-    # Method 1: Try the authorization parameter
-    auth_header = authorization
+    # Header lookups are case-insensitive, so each header is read only once
+    auth_header = authorization or api_key
 
-    # Method 2: Try custom x-api-key header
-    if not auth_header and api_key:
-        auth_header = (
-            api_key if api_key.startswith("llm-router-") else f"Bearer {api_key}"
-        )
-
-    # Method 3: Try getting from request headers directly
-    if not auth_header:
-        auth_header = request.headers.get("authorization")
+    # Header names only; values carry credentials
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Auth request headers: %s", list(request.headers.keys()))
 
-    # Method 4: Try case variations
     if not auth_header:
-        auth_header = request.headers.get("Authorization")
-
-    # Method 5: Try custom header variations
-    if not auth_header:
-        auth_header = request.headers.get("x-api-key")
-
-    # Debug all headers (comment out in production)
-    print(f"🔍 All request headers: {dict(request.headers)}")
-    print(f"🔍 Authorization parameter: {authorization}")
-    print(f"🔍 X-API-Key parameter: {api_key}")
-    print(f"🔍 Final auth_header: {auth_header}")
-
-    if not auth_header:
-        print("❌ No authorization header found in any method")
+        logger.debug("No authorization header found")
         raise HTTPException(
             status_code=401,
             detail={
@@ -62,7 +37,6 @@ async def verify_api_key(
                     "Authorization: Bearer llm-router-your-key",
                     "x-api-key: llm-router-your-key",
                 ],
-                "debug_headers": dict(request.headers),
             },
         )
 
@@ -71,17 +45,10 @@ async def verify_api_key(
 
     if auth_header.startswith("Bearer "):
         # Standard format: "Bearer llm-router-..."
-        api_key_value = auth_header.replace("Bearer ", "").strip()
+        api_key_value = auth_header[7:].strip()
     elif auth_header.startswith("llm-router-"):
         # Direct format: "llm-router-..."
         api_key_value = auth_header.strip()
-    else:
-        # Try to extract the key if it contains our prefix
-        if "llm-router-" in auth_header:
-            start_idx = auth_header.find("llm-router-")
-            api_key_value = auth_header[start_idx:].strip()
-
-    print(f"🔍 Extracted API key: {api_key_value[:20] if api_key_value else 'None'}...")
 
     if not api_key_value:
         raise HTTPException(
@@ -98,7 +65,6 @@ async def verify_api_key(
     try:
         redis_client = get_redis()
         key_manager = APIKeyManager(db, redis_client)
-
         api_key_record = key_manager.verify_api_key(api_key_value)
 
         if not api_key_record:
@@ -110,18 +76,28 @@ async def verify_api_key(
         # Update usage count
         key_manager.increment_usage(api_key_record)
 
-        print(f"✅ API key verified: {api_key_record.name}")
+        logger.debug("API key verified: %s", api_key_record.name)
         return api_key_record
 
     except HTTPException:
         raise
     except Exception as e:
-        print(f"❌ API key verification failed: {e}")
+        logger.error(f"❌ API key verification failed: {e}")
         raise HTTPException(
             status_code=401, detail=f"API key verification failed: {str(e)}"
         )
 
 
-def get_current_api_key(api_key: APIKey = Depends(verify_api_key)) -> APIKey:
+def get_current_api_key(
+    api_key: CachedAPIKey = Depends(verify_api_key),
+) -> CachedAPIKey:
     """Get the current authenticated API key."""
     return api_key
+
+
+def get_client_manager(request: Request) -> ClientManager:
+    """Get the provider client manager built during startup."""
+    client_manager = getattr(request.app.state, "client_manager", None)
+    if client_manager is None:
+        raise HTTPException(status_code=503, detail="LLM providers are starting up")
+    return client_manager
@@ -3,52 +3,43 @@
 # =============================================================================
 """API routes for listing available models and providers."""
 
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Any, Callable
 
-from ..models.api_key import APIKey
-from ..schemas import ModelsResponse, ModelInfo, ProvidersResponse, ProviderInfo
-from ..providers.clients import client_manager
-from .dependencies import get_current_api_key
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi.responses import ORJSONResponse
+
+from ..utils.auth import CachedAPIKey
+from ..schemas import ModelsResponse, ModelInfo, ProvidersResponse
+from ..providers.clients import ClientManager
+from .dependencies import get_client_manager, get_current_api_key
 
 router = APIRouter(prefix="/v1/models", tags=["Models"])
 
 
 @router.get("/", response_model=ModelsResponse)
-async def list_models(current_key: APIKey = Depends(get_current_api_key)):
+async def list_models(
+    current_key: CachedAPIKey = Depends(get_current_api_key),
+    client_manager: ClientManager = Depends(get_client_manager),
+):
     """List all available models across all providers."""
     try:
-        available_models = client_manager.get_available_models()
-
-        models_list = []
-        for provider, model_list in available_models.items():
-            for model in model_list:
-                models_list.append(
-                    ModelInfo(id=model, provider=provider, owned_by=provider)
-                )
-
-        return ModelsResponse(data=models_list)
+        # Returned directly; ModelsResponse above only documents the shape
+        return _catalog_response(client_manager, "models", _build_models)
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to list models: {str(e)}")
 
 
 @router.get("/providers", response_model=ProvidersResponse)
-async def list_providers(current_key: APIKey = Depends(get_current_api_key)):
+async def list_providers(
+    current_key: CachedAPIKey = Depends(get_current_api_key),
+    client_manager: ClientManager = Depends(get_client_manager),
+):
     """List all available providers and their status."""
     try:
-        provider_status = client_manager.get_provider_status()
-
-        providers_data = {}
-        for provider, status in provider_status.items():
-            providers_data[provider] = ProviderInfo(
-                name=provider,
-                enabled=status["enabled"],
-                models=status["models"],
-                model_count=status["model_count"],
-                base_url=status["base_url"],
-            )
-
-        return ProvidersResponse(data=providers_data)
+        # Returned directly; ProvidersResponse above only documents the shape
+        return _catalog_response(client_manager, "providers", _build_providers)
 
     except Exception as e:
         raise HTTPException(
@@ -56,9 +47,58 @@ async def list_providers(current_key: APIKey = Depends(get_current_api_key)):
         )
 
 
-@router.get("/{model_id}")
+def _catalog_response(
+    client_manager: ClientManager,
+    name: str,
+    builder: Callable[[ClientManager], Any],
+) -> Response:
+    """Serve a catalog body, serialized once per client manager rebuild."""
+    body = client_manager.response_bodies.get(name)
+    if body is None:
+        body = client_manager.response_bodies[name] = orjson.dumps(
+            builder(client_manager)
+        )
+    return Response(content=body, media_type="application/json")
+
+
+def _build_models(client_manager: ClientManager) -> dict:
+    """Build the ModelsResponse body."""
+    available_models = client_manager.get_available_models()
+
+    return {
+        "object": "list",
+        "data": [
+            {"id": model, "object": "model", "provider": provider, "owned_by": provider}
+            for provider, model_list in available_models.items()
+            for model in model_list
+        ],
+    }
+
+
+def _build_providers(client_manager: ClientManager) -> dict:
+    """Build the ProvidersResponse body."""
+    provider_status = client_manager.get_provider_status()
+
+    return {
+        "object": "list",
+        "data": {
+            provider: {
+                "name": provider,
+                "enabled": status["enabled"],
+                "models": status["models"],
+                "model_count": status["model_count"],
+                "base_url": status["base_url"],
+            }
+            for provider, status in provider_status.items()
+        },
+    }
+
+
+@router.get("/{model_id}", response_model=ModelInfo)
 async def get_model_info(
-    model_id: str, current_key: APIKey = Depends(get_current_api_key)
+    model_id: str,
+    current_key: CachedAPIKey = Depends(get_current_api_key),
+    client_manager: ClientManager = Depends(get_client_manager),
 ):
     """Get information about a specific model."""
     try:
@@ -71,7 +111,14 @@ async def get_model_info(
                 detail=f"Model '{model_id}' not found. Available models: {available_models}",
             )
 
-        return ModelInfo(id=model_id, provider=provider, owned_by=provider)
+        return ORJSONResponse(
+            content={
+                "id": model_id,
+                "object": "model",
+                "provider": provider,
+                "owned_by": provider,
+            }
+        )
 
     except HTTPException:
         raise
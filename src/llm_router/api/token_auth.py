@@ -1,10 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException, Form
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, Field
 from typing import Optional
 from datetime import timedelta
 
-from ..database import get_db
+from ..database import get_db, get_redis
 from ..models.api_key import APIKey
 from ..utils.auth import APIKeyManager
 from ..utils.tokens import TokenManager
@@ -39,7 +40,7 @@ class RefreshTokenRequest(BaseModel):
 
 
 @router.post("/token", response_model=TokenResponse)
-async def create_token(request: TokenRequest, db: Session = Depends(get_db)):
+def create_token(request: TokenRequest, db: Session = Depends(get_db)):
     """
     Create a JWT token using your API key.
 
@@ -58,7 +59,7 @@ async def create_token(request: TokenRequest, db: Session = Depends(get_db)):
             raise HTTPException(status_code=401, detail="API key is disabled")
 
         # Create JWT token
-        token_manager = TokenManager(db)
+        token_manager = TokenManager(db, get_redis())
         expires_in = timedelta(hours=request.expires_in_hours)
 
         token_data = token_manager.create_token(
@@ -68,7 +69,7 @@ async def create_token(request: TokenRequest, db: Session = Depends(get_db)):
         # Update API key usage
         key_manager.increment_usage(api_key_record)
 
-        return TokenResponse(**token_data)
+        return ORJSONResponse(content=token_data)
 
     except HTTPException:
         raise
@@ -77,7 +78,7 @@ async def create_token(request: TokenRequest, db: Session = Depends(get_db)):
 
 
 @router.post("/token/form", response_model=TokenResponse)
-async def create_token_form(
+def create_token_form(
     api_key: str = Form(..., description="Your API key"),
     expires_in_hours: int = Form(24, description="Token expiry in hours"),
     db: Session = Depends(get_db),
@@ -88,25 +89,25 @@ async def create_token_form(
     This is useful for testing with curl or form-based tools.
     """
     request = TokenRequest(api_key=api_key, expires_in_hours=expires_in_hours)
-    return await create_token(request, db)
+    return create_token(request, db)
 
 
 @router.post("/refresh", response_model=TokenResponse)
-async def refresh_token(request: RefreshTokenRequest, db: Session = Depends(get_db)):
+def refresh_token(request: RefreshTokenRequest, db: Session = Depends(get_db)):
     """
     Refresh an existing JWT token.
 
     This creates a new token with a fresh expiry time.
     """
     try:
-        token_manager = TokenManager(db)
+        token_manager = TokenManager(db, get_redis())
 
         new_token_data = token_manager.refresh_token(request.token)
 
         if not new_token_data:
             raise HTTPException(status_code=401, detail="Invalid or expired token")
 
-        return TokenResponse(**new_token_data)
+        return ORJSONResponse(content=new_token_data)
 
     except HTTPException:
         raise
@@ -117,14 +118,14 @@ async def refresh_token(request: RefreshTokenRequest, db: Session = Depends(get_
 
 
 @router.post("/verify")
-async def verify_token(request: RefreshTokenRequest, db: Session = Depends(get_db)):
+def verify_token(request: RefreshTokenRequest, db: Session = Depends(get_db)):
     """
     Verify a JWT token and return its details.
 
     This endpoint checks if a token is valid and returns information about it.
     """
     try:
-        token_manager = TokenManager(db)
+        token_manager = TokenManager(db, get_redis())
 
         token_data = token_manager.verify_token(request.token)
 
@@ -147,24 +148,25 @@ async def verify_token(request: RefreshTokenRequest, db: Session = Depends(get_d
 
 
 @router.delete("/revoke")
-async def revoke_token(request: RefreshTokenRequest, db: Session = Depends(get_db)):
+def revoke_token(request: RefreshTokenRequest, db: Session = Depends(get_db)):
     """
     Revoke a JWT token.
 
-    This marks a token as invalid (though for JWT, it will still be valid until expiry).
+    The token is rejected by /auth/verify and /auth/refresh until it expires.
     """
     try:
-        token_manager = TokenManager(db)
+        redis_client = get_redis()
+        token_manager = TokenManager(db, redis_client)
 
         is_valid = token_manager.revoke_token(request.token)
 
         if not is_valid:
             raise HTTPException(status_code=401, detail="Invalid token")
 
-        return {
-            "message": "Token revoked successfully",
-            "note": "JWT tokens cannot be truly revoked until expiry - use short expiry times for security",
-        }
+        response = {"message": "Token revoked successfully"}
+        if redis_client is None:
+            response["note"] = "Without Redis, revocation applies only to this worker"
+        return response
 
     except HTTPException:
         raise
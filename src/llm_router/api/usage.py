@@ -3,28 +3,22 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from sqlalchemy import func
-from ..database import get_db
+from ..database import get_db, get_redis
 from ..api.dependencies import verify_api_key
-from ..models import APIKey, UsageLog
+from ..models import UsageLog
 from ..schemas import UsageResponse
+from ..utils.auth import APIKeyManager, CachedAPIKey
 
 router = APIRouter(prefix="/v1/usage", tags=["Usage"])
 
 
 @router.get("/", response_model=UsageResponse)
-async def get_usage(
-    api_key: APIKey = Depends(verify_api_key), db: Session = Depends(get_db)
+def get_usage(
+    api_key: CachedAPIKey = Depends(verify_api_key), db: Session = Depends(get_db)
 ):
     """Get usage statistics for the authenticated API key."""
     try:
-        # Get usage logs for this API key
-        logs = db.query(UsageLog).filter(UsageLog.api_key_id == api_key.id).all()
-
-        total_requests = len(logs)
-        total_tokens = sum(log.tokens_used or 0 for log in logs)
-        total_cost = sum(log.cost or 0.0 for log in logs)
-
-        # Provider breakdown
+        # Aggregate per provider in SQL; totals are summed from these few rows
         provider_stats = (
             db.query(
                 UsageLog.provider,
@@ -45,6 +39,10 @@ async def get_usage(
                 "cost": float(stat.cost or 0.0),
             }
 
+        total_requests = sum(p["requests"] for p in provider_breakdown.values())
+        total_tokens = sum(p["tokens"] for p in provider_breakdown.values())
+        total_cost = sum(p["cost"] for p in provider_breakdown.values())
+
         return UsageResponse(
             api_key_id=api_key.id,
             total_requests=total_requests,
@@ -60,11 +58,15 @@ async def get_usage(
 
 
 @router.get("/summary")
-async def get_usage_summary(api_key: APIKey = Depends(verify_api_key)):
+def get_usage_summary(
+    api_key: CachedAPIKey = Depends(verify_api_key), db: Session = Depends(get_db)
+):
     """Get a quick usage summary."""
+    # verify_api_key returns a cached snapshot, so read the live usage count
+    usage_count = APIKeyManager(db, get_redis()).get_usage_count(api_key.id)
     return {
         "api_key_id": api_key.id,
         "message": "Usage tracking is active",
         "rate_limit": api_key.rate_limit,
-        "current_usage": api_key.usage_count,
+        "current_usage": usage_count,
     }
@@ -7,6 +7,10 @@ class Settings(BaseSettings):
 
     # Database
     database_url: str = "sqlite:///./llm_router.db"
+    db_pool_size: int = 20
+    db_max_overflow: int = 40
+    db_pool_timeout: int = 10
+    db_pool_recycle: int = 1800
 
     # Redis
     redis_url: str = "redis://localhost:6379"
@@ -16,6 +20,11 @@ class Settings(BaseSettings):
     gemini_api_key: Optional[str] = None
     groq_api_key: Optional[str] = None
 
+    # Max in-flight requests per provider
+    openai_max_concurrency: int = 32
+    gemini_max_concurrency: int = 32
+    groq_max_concurrency: int = 64
+
     # Base URLs
     gemini_base_url: str = "https://generativelanguage.googleapis.com/v1"
     groq_base_url: str = "https://api.groq.com/openai/v1"
@@ -1,6 +1,7 @@
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.pool import StaticPool
 from typing import Generator
 import redis
 import logging
@@ -9,13 +10,27 @@ from .config import settings
 
 logger = logging.getLogger(__name__)
 
+
+def _engine_options() -> dict:
+    """Connection pool options for the configured database."""
+    if "sqlite" in settings.database_url:
+        options = {"connect_args": {"check_same_thread": False}}
+        # An in-memory database lives on a single connection, so share it
+        if settings.database_url in ("sqlite://", "sqlite:///:memory:"):
+            options["poolclass"] = StaticPool
+        return options
+
+    return {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": True,
+    }
+
+
 # SQLAlchemy setup
-engine = create_engine(
-    settings.database_url,
-    connect_args=(
-        {"check_same_thread": False} if "sqlite" in settings.database_url else {}
-    ),
-)
+engine = create_engine(settings.database_url, **_engine_options())
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
@@ -1,19 +1,54 @@
+import asyncio
+import atexit
+import importlib
 import logging
+import os
+import queue
 import sys
 from contextlib import asynccontextmanager
+from logging.handlers import QueueHandler, QueueListener
 
-from fastapi import FastAPI, HTTPException, Request
+import orjson
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from fastapi.security import HTTPBearer
+from fastapi.openapi.docs import get_redoc_html, get_swagger_ui_html
 from fastapi.openapi.utils import get_openapi
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[logging.StreamHandler(sys.stdout)],
+# Configure logging: records are queued and written to stdout by a background
+# thread, so a slow stdout pipe never blocks the event loop
+stdout_handler = logging.StreamHandler(sys.stdout)
+stdout_handler.setFormatter(
+    logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
 )
+queue_handler = QueueHandler(queue.SimpleQueue())
+queue_handler.setFormatter(logging.Formatter("%(message)s"))
+
+
+def start_log_listener():
+    """Start the thread that writes queued log records to stdout."""
+    global log_listener
+    # A fresh queue each time: one inherited across fork may hold a lock
+    queue_handler.queue = queue.SimpleQueue()
+    log_listener = QueueListener(
+        queue_handler.queue, stdout_handler, respect_handler_level=True
+    )
+    log_listener.start()
+
+
+def stop_log_listener():
+    """Drain queued records and stop the listener thread."""
+    log_listener.stop()
+
+
+start_log_listener()
+atexit.register(stop_log_listener)
+# Threads don't survive fork, so workers forked by gunicorn --preload need
+# their own listener
+os.register_at_fork(after_in_child=start_log_listener)
+
+logging.basicConfig(level=logging.INFO, handlers=[queue_handler])
 logger = logging.getLogger(__name__)
 
 # Import after logging setup
@@ -21,6 +56,43 @@ from .config import settings
 from .database import create_tables
 
 
+async def init_client_manager(app: FastAPI):
+    """Build the provider clients off the event loop and publish them."""
+    from .providers.clients import ClientManager
+
+    try:
+        client_manager = await asyncio.to_thread(ClientManager)
+    except Exception as e:
+        logger.error(f"❌ Provider initialization failed: {e}")
+        return
+
+    available_providers = len(client_manager.clients)
+    total_models = len(client_manager.model_to_provider)
+    logger.info(
+        f"✅ Initialized {available_providers} providers with {total_models} models"
+    )
+
+    if available_providers == 0:
+        logger.warning("⚠️ No LLM providers configured! Add API keys to .env file")
+
+    app.state.health_body = build_health_body(client_manager)
+    app.state.client_manager = client_manager
+
+
+def build_health_body(client_manager) -> bytes:
+    """Serialize the /health response; providers are fixed after startup."""
+    return orjson.dumps(
+        {
+            "status": "healthy",
+            "timestamp": "2024-01-01T00:00:00Z",
+            "providers": len(client_manager.clients),
+            "models": len(client_manager.model_to_provider),
+            "database": "connected",
+            "redis": "optional",
+        }
+    )
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan manager."""
@@ -34,21 +106,35 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.error(f"❌ Database initialization failed: {e}")
 
-    # Initialize providers
-    try:
-        from .providers.clients import client_manager
+    # Initialize providers in the background; /health/ready reports when done
+    app.state.client_manager = None
+    client_manager_task = asyncio.create_task(init_client_manager(app))
 
-        available_providers = len(client_manager.clients)
-        total_models = len(client_manager.model_to_provider)
-        logger.info(
-            f"✅ Initialized {available_providers} providers with {total_models} models"
-        )
+    from .utils.auth import log_hash_backend
 
-        if available_providers == 0:
-            logger.warning("⚠️ No LLM providers configured! Add API keys to .env file")
+    log_hash_backend()
 
-    except Exception as e:
-        logger.error(f"❌ Provider initialization failed: {e}")
+    # Build the OpenAPI schema now so the first /docs visitor doesn't pay for it
+    app.state.openapi_bytes = orjson.dumps(app.openapi())
+
+    # Start the coarse clock and background flushes of buffered usage data
+    from .utils.auth import flush_buffered_usage, usage_flush_loop
+    from .utils.clock import clock_ticker
+    from .utils.usage_logs import flush_usage_logs, usage_log_writer
+
+    clock_task = asyncio.create_task(clock_ticker())
+    usage_flush_task = asyncio.create_task(usage_flush_loop())
+    usage_log_task = asyncio.create_task(usage_log_writer())
+
+    # Evict keys deactivated on any worker from the local key and token caches
+    from .utils.auth import evict_cached_api_key, subscribe_api_key_invalidations
+    from .utils.tokens import evict_cached_tokens
+
+    def evict_api_key(key_id: str):
+        evict_cached_api_key(key_id)
+        evict_cached_tokens(key_id)
+
+    invalidation_listener = subscribe_api_key_invalidations(evict_api_key)
 
     logger.info("🎯 LLM Router Service is ready!")
 
@@ -56,6 +142,20 @@ async def lifespan(app: FastAPI):
 
     # Shutdown
     logger.info("🛑 Shutting down LLM Router Service...")
+    clock_task.cancel()
+    usage_flush_task.cancel()
+    usage_log_task.cancel()
+    await flush_buffered_usage()
+    await flush_usage_logs()
+    if invalidation_listener:
+        invalidation_listener.stop()
+
+    client_manager_task.cancel()
+    if app.state.client_manager is not None:
+        try:
+            await app.state.client_manager.aclose()
+        except Exception as e:
+            logger.error(f"❌ Failed to close provider clients: {e}")
 
 
 # Create FastAPI app
@@ -63,8 +163,11 @@ app = FastAPI(
     title="LLM Router Service",
     description="A unified API gateway for multiple LLM providers (OpenAI, Gemini, Groq)",
     version="1.0.0",
-    docs_url="/docs",
-    redoc_url="/redoc",
+    # Served by the routes below from the schema precomputed at startup
+    openapi_url=None,
+    docs_url=None,
+    redoc_url=None,
+    default_response_class=ORJSONResponse,
     lifespan=lifespan,
 )
 
@@ -98,6 +201,28 @@ def custom_openapi():
 
 app.openapi = custom_openapi
 
+
+@app.get("/openapi.json", include_in_schema=False)
+async def openapi_json(request: Request):
+    """Serve the OpenAPI schema from pre-serialized bytes."""
+    openapi_bytes = getattr(request.app.state, "openapi_bytes", None)
+    if openapi_bytes is None:
+        openapi_bytes = request.app.state.openapi_bytes = orjson.dumps(app.openapi())
+    return Response(content=openapi_bytes, media_type="application/json")
+
+
+@app.get("/docs", include_in_schema=False)
+async def swagger_ui():
+    return get_swagger_ui_html(
+        openapi_url="/openapi.json", title=f"{app.title} - Swagger UI"
+    )
+
+
+@app.get("/redoc", include_in_schema=False)
+async def redoc():
+    return get_redoc_html(openapi_url="/openapi.json", title=f"{app.title} - ReDoc")
+
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -111,7 +236,7 @@ app.add_middleware(
 # Exception handlers
 @app.exception_handler(404)
 async def not_found_handler(request, exc):
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=404,
         content={"error": {"message": "Not found", "type": "not_found"}},
     )
@@ -120,7 +245,7 @@ async def not_found_handler(request, exc):
 @app.exception_handler(500)
 async def internal_error_handler(request, exc):
     logger.error(f"Internal server error: {exc}")
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=500,
         content={
             "error": {"message": "Internal server error", "type": "internal_error"}
@@ -128,11 +253,9 @@ async def internal_error_handler(request, exc):
     )
 
 
-# Root endpoints
-@app.get("/")
-async def root():
-    """Root endpoint with service information."""
-    return {
+# Root endpoints (static bodies are serialized once)
+ROOT_BODY = orjson.dumps(
+    {
         "service": "LLM Router Service",
         "version": "1.0.0",
         "description": "Unified API gateway for multiple LLM providers",
@@ -146,108 +269,101 @@ async def root():
             "usage": "/v1/usage",
         },
     }
+)
+LIVE_BODY = orjson.dumps({"status": "alive"})
+READY_BODY = orjson.dumps({"status": "ready"})
+
+
+@app.get("/")
+async def root():
+    """Root endpoint with service information."""
+    return Response(content=ROOT_BODY, media_type="application/json")
 
 
 @app.get("/health")
-async def health_check():
+async def health_check(request: Request):
     """Health check endpoint."""
     try:
-        from .providers.clients import client_manager
-
-        providers_count = len(client_manager.clients)
-        models_count = len(client_manager.model_to_provider)
+        if request.app.state.client_manager is None:
+            raise RuntimeError("LLM providers are starting up")
 
-        return {
-            "status": "healthy",
-            "timestamp": "2024-01-01T00:00:00Z",
-            "providers": providers_count,
-            "models": models_count,
-            "database": "connected",
-            "redis": "optional",
-        }
+        return Response(
+            content=request.app.state.health_body, media_type="application/json"
+        )
     except Exception as e:
         logger.error(f"Health check failed: {e}")
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=503, content={"status": "unhealthy", "error": str(e)}
         )
 
 
-@app.get("/debug/headers")
-async def debug_headers(request: Request):
-    """Debug endpoint to see all request headers (no auth required)."""
-    return {
-        "message": "Debug endpoint - shows all request headers",
-        "headers": dict(request.headers),
-        "method": request.method,
-        "url": str(request.url),
-        "client": request.client.host if request.client else None,
-    }
-
-
-@app.post("/debug/test-auth")
-async def test_auth(request: Request):
-    """Test authentication without actually requiring it."""
-    headers = dict(request.headers)
-
-    # Extract potential auth headers
-    auth_methods = {
-        "authorization": headers.get("authorization"),
-        "Authorization": headers.get("Authorization"),
-        "x-api-key": headers.get("x-api-key"),
-        "X-API-Key": headers.get("X-API-Key"),
-    }
-
-    return {
-        "message": "Auth test endpoint (no verification)",
-        "all_headers": headers,
-        "auth_methods": auth_methods,
-        "instructions": {
-            "method1": "Set Authorization header to: Bearer llm-router-lYHV6fyocIoGmAc_xk4e9XmitOHx6C4vUwnl_ta3v3k",
-            "method2": "Set x-api-key header to: llm-router-lYHV6fyocIoGmAc_xk4e9XmitOHx6C4vUwnl_ta3v3k",
-        },
-    }
+@app.get("/health/live")
+async def liveness_check():
+    """Liveness probe: the process is up and serving requests."""
+    return Response(content=LIVE_BODY, media_type="application/json")
 
 
-# Include API routers
-try:
-    from .api.auth import router as auth_router
+@app.get("/health/ready")
+async def readiness_check(request: Request):
+    """Readiness probe: provider clients are initialized."""
+    if request.app.state.client_manager is None:
+        return ORJSONResponse(status_code=503, content={"status": "starting"})
+    return Response(content=READY_BODY, media_type="application/json")
 
-    app.include_router(auth_router)
-    logger.info("✅ Auth router included")
-except Exception as e:
-    logger.error(f"❌ Failed to include auth router: {e}")
 
-try:
-    from .api.chat import router as chat_router
+# Debug endpoints echo request headers (credentials included), so they are
+# only registered in debug mode
+if settings.debug:
 
-    app.include_router(chat_router)
-    logger.info("✅ Chat router included")
-except Exception as e:
-    logger.error(f"❌ Failed to include chat router: {e}")
+    @app.get("/debug/headers")
+    async def debug_headers(request: Request):
+        """Debug endpoint to see all request headers (no auth required)."""
+        return {
+            "message": "Debug endpoint - shows all request headers",
+            "headers": dict(request.headers),
+            "method": request.method,
+            "url": str(request.url),
+            "client": request.client.host if request.client else None,
+        }
 
-try:
-    from .api.models import router as models_router
+    @app.post("/debug/test-auth")
+    async def test_auth(request: Request):
+        """Test authentication without actually requiring it."""
+        headers = request.headers
 
-    app.include_router(models_router)
-    logger.info("✅ Models router included")
-except Exception as e:
-    logger.error(f"❌ Failed to include models router: {e}")
+        # Extract potential auth headers (lookups are case-insensitive)
+        auth_methods = {
+            "authorization": headers.get("authorization"),
+            "x-api-key": headers.get("x-api-key"),
+        }
 
-try:
-    from .api.usage import router as usage_router
+        return {
+            "message": "Auth test endpoint (no verification)",
+            "all_headers": dict(headers),
+            "auth_methods": auth_methods,
+            "instructions": {
+                "method1": "Set Authorization header to: Bearer llm-router-your-key",
+                "method2": "Set x-api-key header to: llm-router-your-key",
+            },
+        }
 
-    app.include_router(usage_router)
-    logger.info("✅ Usage router included")
-except Exception as e:
-    logger.error(f"❌ Failed to include usage router: {e}")
 
-try:
-    from .api.token_auth import router as token_auth_router
+# Include API routers (module under .api -> name used in logs)
+ROUTERS = {
+    "auth": "Auth",
+    "chat": "Chat",
+    "models": "Models",
+    "usage": "Usage",
+    "token_auth": "Token auth",
+}
 
-    app.include_router(token_auth_router)
-    logger.info("✅ Token auth router included")
-except Exception as e:
-    logger.error(f"❌ Failed to include token auth router: {e}")
+for module_name, label in ROUTERS.items():
+    try:
+        module = importlib.import_module(f".api.{module_name}", __package__)
+        app.include_router(module.router)
+        logger.info(f"✅ {label} router included")
+    except Exception as e:
+        logger.error(f"❌ Failed to include {label.lower()} router: {e}")
 
 
 # Development server
@@ -257,8 +373,14 @@ if __name__ == "__main__":
     logger.info("🚀 Starting development server...")
     uvicorn.run(
         "src.llm_router.main:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True,
-        log_level="info",
+        host=settings.host,
+        port=settings.port,
+        # "auto" picks uvloop and httptools when installed (uvloop isn't on
+        # Windows) and falls back to asyncio and h11 otherwise
+        loop="auto",
+        http="auto",
+        # Reload only supports a single worker
+        reload=settings.debug,
+        workers=1 if settings.debug else settings.workers,
+        log_level=settings.log_level.lower(),
     )
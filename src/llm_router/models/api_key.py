@@ -1,6 +1,6 @@
 """API Key model."""
 
-from sqlalchemy import Column, String, Integer, Boolean, DateTime, Text
+from sqlalchemy import Column, String, Integer, Boolean, DateTime, Text, Index
 from sqlalchemy.sql import func
 from ..database import Base
 
@@ -20,5 +20,17 @@ class APIKey(Base):
     rate_limit = Column(Integer, default=1000, nullable=False)
     usage_count = Column(Integer, default=0, nullable=False)
 
+    __table_args__ = (
+        # Active keys only, covering name, so token lookups by id are
+        # index-only on PostgreSQL; the predicate matches the queries'
+        # is_active IS true (SQLite just uses the primary key)
+        Index(
+            "ix_api_keys_active_id",
+            "id",
+            postgresql_where=is_active.is_(True),
+            postgresql_include=["name"],
+        ).ddl_if(dialect="postgresql"),
+    )
+
     def __repr__(self):
         return f"<APIKey(id='{self.id}', name='{self.name}')>"
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, String, Integer, Float, DateTime, Text
+from sqlalchemy import Column, String, Integer, Float, DateTime, JSON, Index
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.sql import func
 from ..database import Base
 
@@ -22,12 +23,18 @@ class UsageLog(Base):
     completion_tokens = Column(Integer, default=0)
     cost = Column(Float, default=0.0)
 
-    # Request metadata (JSON as text)
-    request_data = Column(Text)  # Avoiding 'metadata' as it's reserved
+    # Request metadata; JSONB on PostgreSQL, JSON text elsewhere
+    # (named request_data as 'metadata' is reserved)
+    request_data = Column(JSON().with_variant(JSONB(), "postgresql"))
 
     # Timestamps
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
 
+    __table_args__ = (
+        Index("ix_usage_logs_api_key_provider", "api_key_id", "provider"),
+        Index("ix_usage_logs_api_key_ts", "api_key_id", timestamp.desc()),
+    )
+
     def __repr__(self):
         return f"<UsageLog(id='{self.id}', provider='{self.provider}', model='{self.model}')>"
 
@@ -1,3 +1,3 @@
-from .clients import client_manager
+from .clients import ClientManager
 
-__all__ = ["client_manager"]
+__all__ = ["ClientManager"]
@@ -1,17 +1,52 @@
+import asyncio
 import logging
-from typing import Dict, List, Optional, Tuple, Any
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Tuple, Any
+
+import httpx
 from fastapi import HTTPException
 
 logger = logging.getLogger(__name__)
 
+# In-flight request limit for providers without a *_max_concurrency setting
+DEFAULT_MAX_CONCURRENCY = 32
+
+# Keep upstream connections alive so requests reuse sockets and TLS sessions
+HTTP_LIMITS = httpx.Limits(
+    max_keepalive_connections=200, max_connections=500, keepalive_expiry=90
+)
+
+
+def create_http_transport() -> httpx.AsyncHTTPTransport:
+    """Create the connection pool shared by every provider client."""
+    return httpx.AsyncHTTPTransport(http2=True, retries=1, limits=HTTP_LIMITS)
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """Create the HTTP client shared by every provider."""
+    return httpx.AsyncClient(
+        transport=create_http_transport(), timeout=60.0, follow_redirects=True
+    )
+
 
 class ClientManager:
     """Manages LLM provider clients."""
 
-    def __init__(self):
+    def __init__(self, http_client: Optional[httpx.AsyncClient] = None):
+        self.http_client = http_client or create_http_client()
         self.clients: Dict[str, Any] = {}
         self.model_to_provider: Dict[str, str] = {}
         self.provider_models: Dict[str, List[str]] = {}
+        # Precomputed routing tables, rebuilt whenever the providers change
+        self.model_routes: Dict[str, Tuple[Any, str]] = {}
+        self.provider_routes: Dict[Tuple[str, str], Any] = {}
+        # Per-provider limits on in-flight upstream requests
+        self.semaphores: Dict[str, asyncio.Semaphore] = {}
+        # Read-only catalog snapshots served by the models endpoints
+        self._available_models: Mapping[str, Tuple[str, ...]] = MappingProxyType({})
+        self._provider_status: Mapping[str, Mapping[str, Any]] = MappingProxyType({})
+        # Serialized response bodies derived from the catalog, by name
+        self.response_bodies: Dict[str, bytes] = {}
         self.setup_clients()
 
     def setup_clients(self):
@@ -31,6 +66,7 @@ class ClientManager:
                     api_key=settings.openai_api_key,
                     timeout=60.0,
                     max_retries=2,
+                    http_client=self.http_client,
                     # Remove problematic parameters for compatibility
                 )
                 self.provider_models["openai"] = [
@@ -62,6 +98,7 @@ class ClientManager:
                     api_key=settings.gemini_api_key,
                     timeout=60.0,
                     max_retries=2,
+                    http_client=self.http_client,
                 )
                 self.provider_models["gemini"] = [
                     "gemini-1.5-pro",
@@ -90,6 +127,7 @@ class ClientManager:
                     api_key=settings.groq_api_key,
                     timeout=60.0,
                     max_retries=2,
+                    http_client=self.http_client,
                 )
                 self.provider_models["groq"] = [
                     "llama3-8b-8192",
@@ -111,10 +149,7 @@ class ClientManager:
                 except Exception as e2:
                     logger.error(f"❌ Groq minimal client also failed: {e2}")
 
-        # Create model-to-provider mapping
-        for provider, models in self.provider_models.items():
-            for model in models:
-                self.model_to_provider[model] = provider
+        self._rebuild()
 
         total_models = len(self.model_to_provider)
         total_providers = len(self.clients)
@@ -126,6 +161,44 @@ class ClientManager:
         else:
             logger.warning("⚠️ No providers initialized. Check your API keys in .env")
 
+    def _rebuild(self):
+        """Rebuild routing tables, concurrency limits and catalog snapshots."""
+        from ..config import settings
+
+        for provider, models in self.provider_models.items():
+            for model in models:
+                self.model_to_provider[model] = provider
+
+        self.model_routes = {
+            model: (self.clients[provider], provider)
+            for model, provider in self.model_to_provider.items()
+            if provider in self.clients
+        }
+        self.provider_routes = {
+            (provider, model): self.clients[provider]
+            for provider, models in self.provider_models.items()
+            if provider in self.clients
+            for model in models
+        }
+        self.semaphores = {
+            provider: self.semaphores.get(provider)
+            or asyncio.Semaphore(
+                getattr(
+                    settings, f"{provider}_max_concurrency", DEFAULT_MAX_CONCURRENCY
+                )
+            )
+            for provider in self.clients
+        }
+        self._available_models = MappingProxyType(
+            {
+                provider: tuple(models)
+                for provider, models in self.provider_models.items()
+                if provider in self.clients
+            }
+        )
+        self._provider_status = MappingProxyType(self._build_provider_status())
+        self.response_bodies = {}
+
     def get_client_for_model(
         self, model: str, preferred_provider: Optional[str] = None
     ) -> Tuple[Any, str]:
@@ -133,25 +206,25 @@ class ClientManager:
 
         # If preferred provider is specified
         if preferred_provider:
+            client = self.provider_routes.get((preferred_provider, model))
+            if client is not None:
+                return client, preferred_provider
+
             if preferred_provider in self.clients:
-                if model in self.provider_models.get(preferred_provider, []):
-                    return self.clients[preferred_provider], preferred_provider
-                else:
-                    available = self.provider_models.get(preferred_provider, [])
-                    raise HTTPException(
-                        status_code=400,
-                        detail=f"Model '{model}' not available for provider '{preferred_provider}'. Available: {available}",
-                    )
-            else:
+                available = self.provider_models.get(preferred_provider, [])
                 raise HTTPException(
                     status_code=400,
-                    detail=f"Provider '{preferred_provider}' not configured or available",
+                    detail=f"Model '{model}' not available for provider '{preferred_provider}'. Available: {available}",
                 )
+            raise HTTPException(
+                status_code=400,
+                detail=f"Provider '{preferred_provider}' not configured or available",
+            )
 
         # Auto-detect provider from model
-        provider = self.model_to_provider.get(model)
-        if provider and provider in self.clients:
-            return self.clients[provider], provider
+        route = self.model_routes.get(model)
+        if route is not None:
+            return route
 
         # Model not found
         available_models = list(self.model_to_provider.keys())
@@ -160,16 +233,16 @@ class ClientManager:
             detail=f"Model '{model}' not available. Available models: {available_models}",
         )
 
-    def get_available_models(self) -> Dict[str, List[str]]:
+    def get_available_models(self) -> Mapping[str, Tuple[str, ...]]:
         """Get all available models grouped by provider."""
-        return {
-            provider: models
-            for provider, models in self.provider_models.items()
-            if provider in self.clients
-        }
+        return self._available_models
 
-    def get_provider_status(self) -> Dict[str, Dict[str, Any]]:
+    def get_provider_status(self) -> Mapping[str, Mapping[str, Any]]:
         """Get status information for all providers."""
+        return self._provider_status
+
+    def _build_provider_status(self) -> Dict[str, Mapping[str, Any]]:
+        """Build status information for all providers."""
         status = {}
 
         for provider, client in self.clients.items():
@@ -183,12 +256,14 @@ class ClientManager:
             elif provider == "gemini":
                 base_url = "https://generativelanguage.googleapis.com/v1"
 
-            status[provider] = {
-                "enabled": True,
-                "models": models,
-                "model_count": len(models),
-                "base_url": base_url,
-            }
+            status[provider] = MappingProxyType(
+                {
+                    "enabled": True,
+                    "models": tuple(models),
+                    "model_count": len(models),
+                    "base_url": base_url,
+                }
+            )
 
         return status
 
@@ -200,33 +275,6 @@ class ClientManager:
         """Get the provider for a specific model."""
         return self.model_to_provider.get(model)
 
-
-# Global client manager instance
-try:
-    client_manager = ClientManager()
-except Exception as e:
-    logger.error(f"❌ Failed to initialize ClientManager: {e}")
-
-    # # Create dummy manager to prevent import errors
-    # class DummyClientManager:
-    #     def __init__(self):
-    #         self.clients = {}
-    #         self.model_to_provider = {}
-    #         self.provider_models = {}
-
-    #     def get_client_for_model(self, model, preferred_provider=None):
-    #         raise HTTPException(status_code=503, detail="No LLM providers available")
-
-    #     def get_available_models(self):
-    #         return {}
-
-    #     def get_provider_status(self):
-    #         return {}
-
-    #     def is_provider_available(self, provider):
-    #         return False
-
-    #     def get_model_provider(self, model):
-    #         return None
-
-    # client_manager = DummyClientManager()
+    async def aclose(self):
+        """Close the shared HTTP client and its connections."""
+        await self.http_client.aclose()
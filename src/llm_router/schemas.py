@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import List, Optional, Dict, Any, Union
 from datetime import datetime
 
@@ -11,6 +11,9 @@ from datetime import datetime
 class ChatMessage(BaseModel):
     """Single chat message."""
 
+    # Build the core validator at import, never lazily on the first request
+    model_config = ConfigDict(defer_build=False, extra="ignore")
+
     role: str = Field(..., description="Role: system, user, or assistant")
     content: str = Field(..., description="Message content")
 
@@ -18,6 +21,8 @@ class ChatMessage(BaseModel):
 class ChatCompletionRequest(BaseModel):
     """Chat completion request."""
 
+    model_config = ConfigDict(defer_build=False, extra="ignore")
+
     model: str = Field(..., description="Model to use")
     messages: List[ChatMessage] = Field(..., description="List of messages")
     max_tokens: Optional[int] = Field(150, description="Maximum tokens to generate")
@@ -46,6 +51,8 @@ class ChatCompletionUsage(BaseModel):
 class ChatCompletionResponse(BaseModel):
     """Chat completion response."""
 
+    model_config = ConfigDict(defer_build=False, extra="ignore")
+
     id: str
     object: str = "chat.completion"
     created: int
@@ -114,7 +121,7 @@ class ModelsResponse(BaseModel):
 class ProviderInfo(BaseModel):
     """Information about a provider."""
 
-    model_config = {"protected_namespaces": ()}
+    model_config = ConfigDict(protected_namespaces=())
 
     name: str
     enabled: bool
@@ -1,12 +1,137 @@
+import asyncio
+import logging
 import secrets
 import hashlib
+import threading
 import uuid
+from collections import Counter
+from dataclasses import asdict, dataclass, fields
 from datetime import datetime
-from typing import Optional
+from typing import Callable, Dict, Optional, Union
+
+import orjson
+from cachetools import TTLCache
+from sqlalchemy import Row, bindparam, func, select, update
 from sqlalchemy.orm import Session
 
+from ..config import settings
+from ..database import SessionLocal, get_redis
 from ..models.api_key import APIKey
 from ..schemas import APIKeyRequest, APIKeyResponse
+from .clock import coarse_now
+
+logger = logging.getLogger(__name__)
+
+# Seconds a verified key stays in Redis before falling back to the database
+API_KEY_CACHE_TTL = 120
+
+# Seconds a verified key stays in the per-worker cache in front of Redis
+API_KEY_LOCAL_CACHE_TTL = 30
+
+# Seconds a missing or inactive key id is remembered, so revocation shows quickly
+API_KEY_NEGATIVE_CACHE_TTL = 5
+
+# Seconds between flushes of buffered usage counts into the database
+USAGE_FLUSH_INTERVAL = 10
+
+# Pub/sub channel carrying ids of deactivated keys to every worker
+API_KEY_INVALIDATE_CHANNEL = "api_key:invalidate"
+
+# Keys are the prefix plus secrets.token_urlsafe(32), which is 43 characters
+API_KEY_TOKEN_LENGTH = 43
+
+
+@dataclass
+class CachedAPIKey:
+    """Lightweight snapshot of an APIKey row, served from the Redis cache."""
+
+    id: str
+    key_hash: str
+    name: str
+    description: Optional[str]
+    created_at: Optional[datetime]
+    is_active: bool
+    rate_limit: int
+    usage_count: int
+
+    @classmethod
+    def from_record(cls, api_key: APIKey) -> "CachedAPIKey":
+        return cls(
+            id=api_key.id,
+            key_hash=api_key.key_hash,
+            name=api_key.name,
+            description=api_key.description,
+            created_at=api_key.created_at,
+            is_active=api_key.is_active,
+            rate_limit=api_key.rate_limit,
+            usage_count=api_key.usage_count,
+        )
+
+    @classmethod
+    def from_row(cls, row: Row) -> "CachedAPIKey":
+        return cls(**row._mapping)
+
+    def dumps(self) -> bytes:
+        return orjson.dumps(asdict(self))
+
+    @classmethod
+    def loads(cls, raw: Union[str, bytes]) -> "CachedAPIKey":
+        data = orjson.loads(raw)
+        if data["created_at"]:
+            data["created_at"] = datetime.fromisoformat(data["created_at"])
+        return cls(**data)
+
+
+# Per-worker cache of verified keys (raw key -> snapshot), so repeat callers
+# skip hashing, Redis and the database entirely
+_KEY_CACHE: TTLCache = TTLCache(maxsize=10_000, ttl=API_KEY_LOCAL_CACHE_TTL)
+_KEY_CACHE_LOCK = threading.Lock()
+
+# Lookups select just the snapshot columns as plain rows, and are built once
+# so SQLAlchemy reuses their compiled form per call
+_SNAPSHOT_COLUMNS = tuple(getattr(APIKey, field.name) for field in fields(CachedAPIKey))
+_LOOKUP_STMT = select(*_SNAPSHOT_COLUMNS).where(
+    APIKey.id == bindparam("id"), APIKey.is_active.is_(True)
+)
+_LOOKUP_BY_HASH_STMT = select(*_SNAPSHOT_COLUMNS).where(
+    APIKey.key_hash == bindparam("key_hash"), APIKey.is_active.is_(True)
+)
+_USAGE_COUNT_STMT = select(APIKey.usage_count).where(APIKey.id == bindparam("id"))
+
+# Per-worker cache of active keys by id (JWT verification), plus the ids that
+# were missing or inactive when last checked
+_KEY_ID_CACHE: TTLCache = TTLCache(maxsize=10_000, ttl=API_KEY_LOCAL_CACHE_TTL)
+_INACTIVE_KEY_IDS: TTLCache = TTLCache(maxsize=10_000, ttl=API_KEY_NEGATIVE_CACHE_TTL)
+
+
+# Per-worker usage buffers, used for last-used times and when Redis is absent
+_usage_buffer: Counter = Counter()
+_last_used_buffer: Dict[str, datetime] = {}
+_USAGE_BUFFER_LOCK = threading.Lock()
+
+
+def hash_api_key(key: str) -> str:
+    """Hash an API key for storage and lookup."""
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def log_hash_backend():
+    """Log whether SHA-256 comes from OpenSSL, which uses SHA-NI when present."""
+    if hashlib.sha256.__module__ == "_hashlib":
+        import ssl
+
+        logger.info(f"✅ API key hashing uses {ssl.OPENSSL_VERSION}")
+    else:
+        logger.warning("⚠️ hashlib is not OpenSSL-backed; API key hashing is slow")
+
+
+def evict_cached_api_key(key_id: str):
+    """Drop an API key from this worker's verification caches."""
+    with _KEY_CACHE_LOCK:
+        for key, record in list(_KEY_CACHE.items()):
+            if record.id == key_id:
+                del _KEY_CACHE[key]
+        _KEY_ID_CACHE.pop(key_id, None)
 
 
 class APIKeyManager:
@@ -30,7 +155,7 @@ class APIKeyManager:
         key = f"{prefix}{secrets.token_urlsafe(32)}"
 
         # Hash the key for storage
-        key_hash = hashlib.sha256(key.encode()).hexdigest()
+        key_hash = hash_api_key(key)
 
         return key, key_hash
 
@@ -56,15 +181,7 @@ class APIKeyManager:
         self.db.refresh(api_key)
 
         # Cache in Redis if available
-        if self.redis:
-            try:
-                self.redis.setex(
-                    f"api_key:{key_hash}",
-                    3600,  # 1 hour cache
-                    f"{api_key.id}:{api_key.name}:{api_key.is_active}",
-                )
-            except Exception:
-                pass  # Redis is optional
+        self._cache_record(api_key)
 
         return APIKeyResponse(
             id=api_key.id,
@@ -76,53 +193,255 @@ class APIKeyManager:
             usage_count=api_key.usage_count,
         )
 
-    def verify_api_key(self, key: str) -> Optional[APIKey]:
+    def verify_api_key(self, key: str) -> Optional[CachedAPIKey]:
         """Verify an API key and return the associated record."""
-        key_hash = hashlib.sha256(key.encode()).hexdigest()
+        # Reject malformed keys before paying for a hash or a lookup
+        prefix = settings.api_key_prefix
+        if len(key) != len(prefix) + API_KEY_TOKEN_LENGTH or not key.startswith(prefix):
+            return None
+
+        with _KEY_CACHE_LOCK:
+            cached = _KEY_CACHE.get(key)
+        if cached is not None:
+            return cached
+
+        api_key = self._load_api_key(key)
+
+        if api_key and api_key.is_active:
+            with _KEY_CACHE_LOCK:
+                _KEY_CACHE[key] = api_key
+
+        return api_key
+
+    def get_active_api_key(self, key_id: str) -> Optional[CachedAPIKey]:
+        """Return a snapshot of an active API key by id, or None."""
+        with _KEY_CACHE_LOCK:
+            cached = _KEY_ID_CACHE.get(key_id)
+            if cached is None and key_id in _INACTIVE_KEY_IDS:
+                return None
+        if cached is not None:
+            return cached
+
+        row = self.db.execute(_LOOKUP_STMT, {"id": key_id}).first()
+
+        with _KEY_CACHE_LOCK:
+            if row is None:
+                _INACTIVE_KEY_IDS[key_id] = True
+                return None
+            snapshot = _KEY_ID_CACHE[key_id] = CachedAPIKey.from_row(row)
+
+        return snapshot
+
+    def _load_api_key(self, key: str) -> Optional[CachedAPIKey]:
+        """Look up an API key in Redis, then the database."""
+        key_hash = hash_api_key(key)
 
         # Try Redis cache first
         if self.redis:
             try:
                 cached = self.redis.get(f"api_key:{key_hash}")
                 if cached:
-                    key_id, name, is_active = cached.split(":", 2)
-                    if is_active == "True":
-                        # Get full record from database
-                        return self.db.query(APIKey).filter(APIKey.id == key_id).first()
+                    return CachedAPIKey.loads(cached)
             except Exception:
                 pass
 
         # Query database
-        api_key = (
-            self.db.query(APIKey)
-            .filter(APIKey.key_hash == key_hash, APIKey.is_active == True)
-            .first()
-        )
+        row = self.db.execute(_LOOKUP_BY_HASH_STMT, {"key_hash": key_hash}).first()
+        if row is None:
+            return None
+
+        api_key = CachedAPIKey.from_row(row)
+        self._cache_record(api_key)
+
+        return api_key
+
+    def increment_usage(self, api_key: Union[APIKey, CachedAPIKey]):
+        """Increment usage count for an API key.
+
+        Counts are buffered (in Redis, or in this worker without Redis) and
+        written to the database by usage_flush_loop().
+        """
+        now = coarse_now()
 
-        if api_key and self.redis:
-            # Cache the result
+        if self.redis:
             try:
-                self.redis.setex(
-                    f"api_key:{key_hash}",
-                    3600,
-                    f"{api_key.id}:{api_key.name}:{api_key.is_active}",
-                )
+                self.redis.incr(f"api_key:usage:{api_key.id}")
+                with _USAGE_BUFFER_LOCK:
+                    _last_used_buffer[api_key.id] = now
+                return
+            except Exception:
+                pass  # Fall back to the local buffer
+
+        with _USAGE_BUFFER_LOCK:
+            _usage_buffer[api_key.id] += 1
+            _last_used_buffer[api_key.id] = now
+
+    def get_usage_count(self, key_id: str) -> int:
+        """Return the current usage count, including counts not yet flushed."""
+        count = self.db.execute(_USAGE_COUNT_STMT, {"id": key_id}).scalar() or 0
+
+        with _USAGE_BUFFER_LOCK:
+            count += _usage_buffer.get(key_id, 0)
+
+        if self.redis:
+            try:
+                count += int(self.redis.get(f"api_key:usage:{key_id}") or 0)
             except Exception:
                 pass
 
-        return api_key
+        return count
 
-    def increment_usage(self, api_key: APIKey):
-        """Increment usage count for an API key."""
-        api_key.usage_count += 1
-        api_key.last_used_at = datetime.utcnow()
+    def deactivate_api_key(self, api_key: Union[APIKey, CachedAPIKey]):
+        """Deactivate an API key and drop it from the cache."""
+        self.db.query(APIKey).filter(APIKey.id == api_key.id).update(
+            {APIKey.is_active: False}, synchronize_session=False
+        )
         self.db.commit()
+        evict_cached_api_key(api_key.id)
 
-        # Update cache
         if self.redis:
             try:
-                key_hash = None  # We'd need to compute this if we want to update cache
-                # For now, just let it expire and refresh
+                self.redis.delete(f"api_key:{api_key.key_hash}")
+                for token_key in self.redis.scan_iter(match=f"jwt:{api_key.id}:*"):
+                    self.redis.delete(token_key)
+                self.redis.publish(API_KEY_INVALIDATE_CHANNEL, api_key.id)
+            except Exception:
                 pass
+
+    def _cache_record(self, api_key: Union[APIKey, CachedAPIKey]):
+        """Store a snapshot of an API key record in Redis."""
+        if not self.redis:
+            return
+
+        if isinstance(api_key, APIKey):
+            api_key = CachedAPIKey.from_record(api_key)
+
+        try:
+            self.redis.set(
+                f"api_key:{api_key.key_hash}",
+                api_key.dumps(),
+                ex=API_KEY_CACHE_TTL,
+            )
+        except Exception:
+            pass  # Redis is optional
+
+
+def subscribe_api_key_invalidations(handler: Callable[[str], None]):
+    """Call handler with the id of every key deactivated by any worker.
+
+    Returns the listener thread (stop it on shutdown), or None without Redis.
+    """
+    redis_client = get_redis()
+    if not redis_client:
+        return None
+
+    try:
+        pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(
+            **{API_KEY_INVALIDATE_CHANNEL: lambda message: handler(message["data"])}
+        )
+        return pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+    except Exception as e:
+        logger.warning(f"⚠️ API key invalidation listener not started: {e}")
+        return None
+
+
+def flush_usage_counts(db: Session, redis_client=None) -> int:
+    """Move buffered usage counts and last-used times into the api_keys table."""
+    with _USAGE_BUFFER_LOCK:
+        deltas = Counter(_usage_buffer)
+        last_used = dict(_last_used_buffer)
+        _usage_buffer.clear()
+        _last_used_buffer.clear()
+
+    # Redis counters are only decremented once the counts are committed
+    counted: Dict[str, int] = {}
+    flush_locked = False
+    try:
+        # Only one worker drains the shared Redis counters per interval
+        if redis_client and redis_client.set(
+            "api_key:usage_flush_lock", 1, nx=True, ex=USAGE_FLUSH_INTERVAL
+        ):
+            flush_locked = True
+            for counter in redis_client.scan_iter(match="api_key:usage:*"):
+                count = int(redis_client.get(counter) or 0)
+                if count:
+                    counted[counter] = count
+
+        totals = deltas.copy()
+        for counter, count in counted.items():
+            totals[counter.rsplit(":", 1)[1]] += count
+
+        rows = [
+            {
+                "key_id": key_id,
+                "delta": totals[key_id],
+                "last_used": last_used.get(key_id),
+            }
+            for key_id in totals.keys() | last_used.keys()
+        ]
+
+        if rows:
+            table = APIKey.__table__
+            db.execute(
+                update(table)
+                .where(table.c.id == bindparam("key_id"))
+                .values(
+                    usage_count=table.c.usage_count + bindparam("delta"),
+                    last_used=func.coalesce(
+                        bindparam("last_used", type_=table.c.last_used.type),
+                        table.c.last_used,
+                    ),
+                ),
+                rows,
+            )
+            db.commit()
+    except Exception:
+        db.rollback()
+        # Put this worker's counts back so the next flush writes them
+        with _USAGE_BUFFER_LOCK:
+            _usage_buffer.update(deltas)
+            for key_id, used_at in last_used.items():
+                _last_used_buffer.setdefault(key_id, used_at)
+        if flush_locked:
+            # Let the next interval retry instead of waiting out the lock
+            try:
+                redis_client.delete("api_key:usage_flush_lock")
             except Exception:
                 pass
+        raise
+
+    if counted:
+        pipe = redis_client.pipeline()
+        for counter, count in counted.items():
+            pipe.decrby(counter, count)
+        pipe.execute()
+
+    return len(rows)
+
+
+def _flush_usage_counts_once():
+    redis_client = get_redis()
+
+    db = SessionLocal()
+    try:
+        flushed = flush_usage_counts(db, redis_client)
+        if flushed:
+            logger.debug(f"Flushed usage counts for {flushed} API keys")
+    finally:
+        db.close()
+
+
+async def flush_buffered_usage():
+    """Write buffered usage counts to the database."""
+    try:
+        await asyncio.to_thread(_flush_usage_counts_once)
+    except Exception as e:
+        logger.error(f"Failed to flush usage counts: {e}")
+
+
+async def usage_flush_loop():
+    """Background task that periodically flushes buffered usage counts."""
+    while True:
+        await asyncio.sleep(USAGE_FLUSH_INTERVAL)
+        await flush_buffered_usage()
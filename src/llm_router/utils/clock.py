@@ -0,0 +1,22 @@
+"""Coarse wall clock for high-frequency timestamps."""
+
+import asyncio
+from datetime import datetime, timezone
+
+# Seconds between clock updates
+CLOCK_RESOLUTION = 1.0
+
+_now: datetime = datetime.now(timezone.utc)
+
+
+def coarse_now() -> datetime:
+    """Current UTC time, accurate to CLOCK_RESOLUTION seconds."""
+    return _now
+
+
+async def clock_ticker():
+    """Background task that keeps coarse_now() up to date."""
+    global _now
+    while True:
+        _now = datetime.now(timezone.utc)
+        await asyncio.sleep(CLOCK_RESOLUTION)
@@ -22,7 +22,8 @@ def setup_logging():
         wrapper_class=structlog.make_filtering_bound_logger(
             logging.getLevelName(settings.log_level)
         ),
-        logger_factory=structlog.WriteLoggerFactory(),
+        # Hand rendered events to stdlib logging so they share its handlers
+        logger_factory=structlog.stdlib.LoggerFactory(),
         cache_logger_on_first_use=False,
     )
 
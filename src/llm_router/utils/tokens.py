@@ -1,79 +1,186 @@
+import base64
+import binascii
+import hashlib
+import hmac
 import jwt
-import secrets
-from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+import orjson
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, ClassVar, Dict, Optional, Union
+from cachetools import TLRUCache, TTLCache
+from sqlalchemy import Row, bindparam, select
 from sqlalchemy.orm import Session
 
 from ..models.api_key import APIKey
 from ..config import settings
+from .auth import API_KEY_CACHE_TTL, APIKeyManager, CachedAPIKey
+
+DEFAULT_TOKEN_EXPIRY = timedelta(hours=24)
+
+# Token creation needs only the id and name of an active key
+_LOOKUP_COLS = select(APIKey.id, APIKey.name).where(
+    APIKey.id == bindparam("id"), APIKey.is_active.is_(True)
+)
+_EXISTS_STMT = (
+    select(1).where(APIKey.id == bindparam("id"), APIKey.is_active.is_(True)).limit(1)
+)
+
+
+def _b64encode(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+def _b64decode(segment: bytes) -> bytes:
+    return base64.urlsafe_b64decode(segment + b"=" * (-len(segment) % 4))
+
+
+_HEADER_B64 = _b64encode(b'{"alg":"HS256","typ":"JWT"}')
+
+
+# Recently verified token payloads by token digest, so a client presenting
+# the same bearer token skips signature checks; entries are rechecked for exp
+_DECODE_CACHE: TTLCache = TTLCache(maxsize=20_000, ttl=60)
+_DECODE_CACHE_LOCK = threading.Lock()
+
+
+def evict_cached_tokens(api_key_id: str) -> None:
+    """Drop this worker's decoded payloads for tokens issued to a key."""
+    with _DECODE_CACHE_LOCK:
+        for digest, payload in list(_DECODE_CACHE.items()):
+            if payload.get("sub") == api_key_id:
+                del _DECODE_CACHE[digest]
+
+
+# Token ids revoked through this worker, each kept until the token expires
+_REVOKED_JTIS: TLRUCache = TLRUCache(
+    maxsize=50_000, ttu=lambda _jti, exp, _now: exp, timer=time.time
+)
+_REVOKED_JTIS_LOCK = threading.Lock()
+
+# Stored in place of a token's cache entry in Redis once it is revoked
+_REVOKED_MARKER = "revoked"
+
+
+# Per-thread buffer of random bytes, so token ids don't each cost a syscall
+_RNG_POOL = threading.local()
+_RNG_POOL_SIZE = 4096
+_JTI_BYTES = 16
+
+
+def _jti() -> str:
+    """Return a random 128-bit hex token id."""
+    buf = getattr(_RNG_POOL, "buf", None)
+    off = getattr(_RNG_POOL, "off", 0)
+    if buf is None or off + _JTI_BYTES > len(buf):
+        buf = _RNG_POOL.buf = os.urandom(_RNG_POOL_SIZE)
+        off = 0
+    _RNG_POOL.off = off + _JTI_BYTES
+    return buf[off : off + _JTI_BYTES].hex()
+
+
+def _reset_rng_pool() -> None:
+    """Drop the inherited buffer so forked workers never reuse token ids."""
+    _RNG_POOL.buf = None
+
+
+os.register_at_fork(after_in_child=_reset_rng_pool)
 
 
 class TokenManager:
-    """Manages JWT tokens for authentication."""
+    """Manages JWT tokens for authentication.
+
+    Signing state is shared by every instance; only the DB session and Redis
+    client are bound per request.
+    """
 
-    def __init__(self, db: Session):
+    # ClassVar so a mypyc build keeps these shared instead of per instance
+    secret_key: ClassVar[str] = settings.secret_key
+    algorithm: ClassVar[str] = "HS256"
+    default_expiry: ClassVar[timedelta] = DEFAULT_TOKEN_EXPIRY
+    _default_expiry_seconds: ClassVar[int] = int(DEFAULT_TOKEN_EXPIRY.total_seconds())
+    # Copied per token so the key setup runs once per process
+    _hmac_template: ClassVar["hmac.HMAC"] = hmac.new(
+        settings.secret_key.encode(), None, hashlib.sha256
+    )
+
+    def __init__(self, db: Session, redis_client=None):
         self.db = db
-        self.secret_key = settings.secret_key
-        self.algorithm = "HS256"
-        self.default_expiry = timedelta(hours=24)  # 24 hours default
+        self.redis = redis_client
 
     def create_token(
         self, api_key_id: str, expires_in: Optional[timedelta] = None
     ) -> Dict[str, Any]:
         """Create a JWT token for an API key."""
-        if expires_in is None:
-            expires_in = self.default_expiry
+        return self._create(self._load(api_key_id), expires_in)
 
-        # Get API key details
-        api_key = self.db.query(APIKey).filter(APIKey.id == api_key_id).first()
-        if not api_key or not api_key.is_active:
+    def _load(self, api_key_id: str) -> Row:
+        """Load the id and name of an active API key."""
+        row = self.db.execute(_LOOKUP_COLS, {"id": api_key_id}).first()
+        if row is None:
             raise ValueError("Invalid or inactive API key")
+        return row
+
+    def _create(
+        self,
+        api_key: Union[Row, CachedAPIKey],
+        expires_in: Optional[timedelta] = None,
+    ) -> Dict[str, Any]:
+        """Create a JWT token for an already loaded API key."""
+        if expires_in is None:
+            expires_in_seconds = self._default_expiry_seconds
+        else:
+            expires_in_seconds = int(expires_in.total_seconds())
 
-        # Create token payload
-        now = datetime.utcnow()
-        expiry = now + expires_in
+        # Create token payload (NumericDate claims are epoch seconds)
+        now_ts = int(time.time())
+        exp_ts = now_ts + expires_in_seconds
 
         payload = {
-            "sub": api_key_id,  # Subject (API key ID)
+            "sub": api_key.id,  # Subject (API key ID)
             "name": api_key.name,  # API key name
-            "iat": now,  # Issued at
-            "exp": expiry,  # Expires at
-            "jti": secrets.token_hex(16),  # JWT ID (unique identifier)
+            "iat": now_ts,  # Issued at
+            "exp": exp_ts,  # Expires at
+            "jti": _jti(),  # JWT ID (unique identifier)
             "type": "access",  # Token type
         }
 
         # Create JWT token
-        token = jwt.encode(payload, self.secret_key, algorithm=self.algorithm)
+        token = self._encode_hs256(payload)
 
         return {
             "access_token": token,
             "token_type": "bearer",
-            "expires_in": int(expires_in.total_seconds()),
-            "expires_at": expiry.isoformat(),
-            "api_key_id": api_key_id,
+            "expires_in": expires_in_seconds,
+            "expires_at": datetime.fromtimestamp(exp_ts, tz=timezone.utc).isoformat(),
+            "api_key_id": api_key.id,
             "api_key_name": api_key.name,
         }
 
     def verify_token(self, token: str) -> Optional[Dict[str, Any]]:
         """Verify and decode a JWT token."""
         try:
-            # Decode the token
-            payload = jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
+            # Decode the token; _decode_hs256 rejects an expired exp claim, and
+            # _cached_decode re-checks it for cached payloads
+            payload = self._cached_decode(token)
 
-            # Check if token has expired (jwt library does this automatically)
             api_key_id = payload.get("sub")
             if not api_key_id:
                 return None
 
+            if self._is_revoked(payload.get("jti")):
+                return None
+
             # Verify the API key still exists and is active
-            api_key = (
-                self.db.query(APIKey)
-                .filter(APIKey.id == api_key_id, APIKey.is_active == True)
-                .first()
-            )
+            api_key = self._get_cached_token(payload)
+            if api_key is None:
+                api_key = APIKeyManager(self.db).get_active_api_key(api_key_id)
 
-            if not api_key:
-                return None
+                if not api_key:
+                    return None
+
+                self._cache_token(payload, api_key)
 
             return {
                 "api_key_id": api_key_id,
@@ -97,11 +204,161 @@ class TokenManager:
         if not token_data:
             return None
 
-        # Create a new token for the same API key
-        return self.create_token(token_data["api_key_id"])
+        # Create a new token for the already verified API key
+        return self._create(token_data["api_key_record"])
 
     def revoke_token(self, token: str) -> bool:
-        """Revoke a token (for now, just verify it's valid)."""
-        # In a more sophisticated system, you'd maintain a blacklist
-        # For now, we just verify the token exists
-        return self.verify_token(token) is not None
+        """Revoke a valid token until it expires.
+
+        The token id is remembered in this worker and, with Redis, written
+        over the token's cache entry so every worker rejects it without an
+        extra lookup. Whether the key is still active is checked against the
+        database rather than the caches.
+        """
+        try:
+            payload = self._decode_hs256(token)
+        except jwt.InvalidTokenError:
+            return False
+
+        api_key_id = payload.get("sub")
+        jti = payload.get("jti")
+        if not api_key_id or self._is_revoked(jti) or not self._is_active(api_key_id):
+            return False
+
+        if not jti:
+            return True
+
+        expires_at = payload.get("exp") or (time.time() + self._default_expiry_seconds)
+        with _REVOKED_JTIS_LOCK:
+            _REVOKED_JTIS[jti] = expires_at
+
+        if self.redis:
+            try:
+                self.redis.set(
+                    f"jwt:{api_key_id}:{jti}",
+                    _REVOKED_MARKER,
+                    ex=max(int(expires_at - time.time()), 1),
+                )
+            except Exception:
+                pass
+
+        return True
+
+    def _is_active(self, api_key_id: str) -> bool:
+        """Check that an API key exists and is active."""
+        return self.db.execute(_EXISTS_STMT, {"id": api_key_id}).first() is not None
+
+    @staticmethod
+    def _is_revoked(jti: Optional[str]) -> bool:
+        """Check whether a token id was revoked through this worker."""
+        if not jti:
+            return False
+        with _REVOKED_JTIS_LOCK:
+            return jti in _REVOKED_JTIS
+
+    def _encode_hs256(self, payload: Dict[str, Any]) -> str:
+        """Sign a payload as an HS256 JWT."""
+        signing_input = _HEADER_B64 + b"." + _b64encode(orjson.dumps(payload))
+        signature = self._sign(signing_input)
+        return (signing_input + b"." + _b64encode(signature)).decode()
+
+    def _sign(self, signing_input: bytes) -> bytes:
+        """Compute the HS256 signature of a JWT signing input."""
+        h = self._hmac_template.copy()
+        h.update(signing_input)
+        return h.digest()
+
+    def _cached_decode(self, token: str) -> Dict[str, Any]:
+        """Decode a token, reusing the payload of a recent verification."""
+        digest = hashlib.blake2b(token.encode(), digest_size=16).digest()
+        with _DECODE_CACHE_LOCK:
+            payload = _DECODE_CACHE.get(digest)
+        if payload is not None and payload.get("exp", float("inf")) > time.time():
+            return payload
+
+        payload = self._decode_hs256(token)
+        with _DECODE_CACHE_LOCK:
+            _DECODE_CACHE[digest] = payload
+        return payload
+
+    def _decode_hs256(self, token: str) -> Dict[str, Any]:
+        """Verify an HS256 JWT and return its payload.
+
+        Raises the matching jwt.InvalidTokenError subclass on failure.
+        """
+        try:
+            header_b64, payload_b64, signature_b64 = token.encode().split(b".")
+            header = orjson.loads(_b64decode(header_b64))
+            signature = _b64decode(signature_b64)
+        except (ValueError, binascii.Error) as e:
+            raise jwt.DecodeError("Invalid token") from e
+
+        if not isinstance(header, dict) or header.get("alg") != self.algorithm:
+            raise jwt.InvalidAlgorithmError("The specified alg value is not allowed")
+
+        expected = self._sign(header_b64 + b"." + payload_b64)
+        if not hmac.compare_digest(signature, expected):
+            raise jwt.InvalidSignatureError("Signature verification failed")
+
+        try:
+            payload = orjson.loads(_b64decode(payload_b64))
+        except (ValueError, binascii.Error) as e:
+            raise jwt.DecodeError("Invalid payload") from e
+        if not isinstance(payload, dict):
+            raise jwt.DecodeError("Invalid payload")
+
+        exp = payload.get("exp")
+        if exp is not None:
+            if not isinstance(exp, (int, float)):
+                raise jwt.DecodeError("Expiration Time claim (exp) must be a number")
+            if exp <= time.time():
+                raise jwt.ExpiredSignatureError("Signature has expired")
+
+        return payload
+
+    def _get_cached_token(self, payload: Dict[str, Any]) -> Optional[CachedAPIKey]:
+        """Return the cached API key for an already verified token.
+
+        Raises jwt.InvalidTokenError if the token was revoked.
+        """
+        if not self.redis or not payload.get("jti"):
+            return None
+
+        try:
+            cached = self.redis.get(f"jwt:{payload['sub']}:{payload['jti']}")
+        except Exception:
+            return None  # Redis is optional
+
+        if cached == _REVOKED_MARKER:
+            with _REVOKED_JTIS_LOCK:
+                _REVOKED_JTIS[payload["jti"]] = payload["exp"]
+            raise jwt.InvalidTokenError("Token has been revoked")
+
+        if cached:
+            return CachedAPIKey.loads(cached)
+
+        return None
+
+    def _cache_token(self, payload: Dict[str, Any], api_key: CachedAPIKey):
+        """Remember a verified token until it expires.
+
+        Entries are keyed by API key id so deactivate_api_key() can drop
+        them; the TTL is capped at the API key cache TTL as a backstop. An
+        existing entry is never overwritten, so revocations stick.
+        """
+        if not self.redis or not payload.get("jti"):
+            return
+
+        ttl = min(int(payload["exp"] - time.time()), API_KEY_CACHE_TTL)
+        if ttl <= 0:
+            return
+
+        try:
+            self.redis.set(
+                f"jwt:{payload['sub']}:{payload['jti']}",
+                api_key.dumps(),
+                ex=ttl,
+                nx=True,
+            )
+        except Exception:
+            pass
@@ -0,0 +1,65 @@
+"""Write-behind buffer for usage log rows."""
+
+import asyncio
+import logging
+from typing import Any, Dict, List
+
+from sqlalchemy import insert
+
+from ..database import SessionLocal
+from ..models.usage_log import UsageLog
+
+logger = logging.getLogger(__name__)
+
+# Rows per INSERT batch, seconds between flushes, and rows buffered at most
+USAGE_LOG_BATCH_SIZE = 500
+USAGE_LOG_FLUSH_INTERVAL = 0.25
+USAGE_LOG_QUEUE_SIZE = 10_000
+
+usage_queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue(
+    maxsize=USAGE_LOG_QUEUE_SIZE
+)
+
+
+def enqueue_usage_log(row: Dict[str, Any]):
+    """Buffer a usage log row for the background writer."""
+    try:
+        usage_queue.put_nowait(row)
+    except asyncio.QueueFull:
+        logger.warning(f"Usage log buffer full, dropping log {row['id']}")
+
+
+def write_usage_logs(rows: List[Dict[str, Any]]):
+    """Insert a batch of usage log rows as one multi-row INSERT."""
+    db = SessionLocal()
+    try:
+        db.execute(insert(UsageLog.__table__), rows)
+        db.commit()
+    finally:
+        db.close()
+
+
+def _drain(limit: int) -> List[Dict[str, Any]]:
+    rows = []
+    while len(rows) < limit:
+        try:
+            rows.append(usage_queue.get_nowait())
+        except asyncio.QueueEmpty:
+            break
+    return rows
+
+
+async def flush_usage_logs():
+    """Write every buffered usage log row to the database."""
+    while rows := _drain(USAGE_LOG_BATCH_SIZE):
+        try:
+            await asyncio.to_thread(write_usage_logs, rows)
+        except Exception as e:
+            logger.error(f"Failed to write {len(rows)} usage logs: {e}")
+
+
+async def usage_log_writer():
+    """Background task that periodically flushes buffered usage logs."""
+    while True:
+        await asyncio.sleep(USAGE_LOG_FLUSH_INTERVAL)
+        await flush_usage_logs()
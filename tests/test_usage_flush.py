@@ -0,0 +1,65 @@
+"""Tests for flushing buffered API key usage counts."""
+
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src.llm_router.database import Base
+from src.llm_router.models.api_key import APIKey
+from src.llm_router.utils import auth
+
+
+@pytest.fixture
+def db():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.add(APIKey(id="key-1", key_hash="hash-1", name="test"))
+    session.commit()
+    yield session
+    session.close()
+    auth._usage_buffer.clear()
+    auth._last_used_buffer.clear()
+
+
+def test_flush_writes_buffered_counts(db):
+    used_at = datetime(2024, 1, 1)
+    auth._usage_buffer["key-1"] += 3
+    auth._last_used_buffer["key-1"] = used_at
+
+    assert auth.flush_usage_counts(db) == 1
+
+    api_key = db.get(APIKey, "key-1")
+    assert api_key.usage_count == 3
+    assert api_key.last_used == used_at
+    assert not auth._usage_buffer
+    assert not auth._last_used_buffer
+
+
+def test_failed_flush_restores_buffered_counts(db, monkeypatch):
+    used_at = datetime(2024, 1, 1)
+    auth._usage_buffer["key-1"] += 3
+    auth._last_used_buffer["key-1"] = used_at
+
+    def fail_commit():
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(db, "commit", fail_commit)
+    with pytest.raises(RuntimeError):
+        auth.flush_usage_counts(db)
+
+    # Counts made while the flush was running are kept alongside the restored ones
+    auth._usage_buffer["key-1"] += 1
+    assert auth._usage_buffer["key-1"] == 4
+    assert auth._last_used_buffer["key-1"] == used_at
+
+    monkeypatch.undo()
+    assert auth.flush_usage_counts(db) == 1
+    assert db.get(APIKey, "key-1").usage_count == 4